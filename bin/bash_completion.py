@@ -9,57 +9,224 @@
 #
 #     complete -C ~/.adhd/bin/bash_completion.py foo
 #
+# Completion expands and resolves "~/.adhd" (or "~/.foo") on every keystroke.
+# To skip that, export the resolved install directory as well, e.g.
+#
+#     export ADHD_HOME=$(realpath ~/.adhd)    # FOO_HOME for "foo"
+#
 
-import json
+import mmap
+import os
+import pickle
+import stat
 import sys
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
 import ruamel.yaml as yaml
-from lib.loader import get_loader
+from ruamel.yaml.events import (
+    AliasEvent,
+    CollectionEndEvent,
+    MappingStartEvent,
+    NodeEvent,
+    ScalarEvent,
+    SequenceStartEvent,
+)
+
+from ruamel.yaml.loader import SafeLoader as PySafeLoader
+from ruamel.yaml.parser import ParserError
+from ruamel.yaml.scanner import ScannerError
+
+try:  # libyaml bindings are an optional part of ruamel.yaml
+    from ruamel.yaml.cyaml import CSafeLoader as SafeLoader
+except ImportError:
+    SafeLoader = PySafeLoader  # type: ignore
+
+# below this size, setting up the mapping costs more than reading the file
+MMAP_THRESHOLD: int = 4096
+
+# an untagged mapping, or one explicitly tagged as a plain map
+PLAIN_MAPPING_TAGS: tuple[str | None, ...] = (None, "tag:yaml.org,2002:map")
+
+# bump to discard existing `.completions` sidecars, e.g. ones holding the results of a failed parse
+CACHE_VERSION: int = 2
+
+
+def is_merge_key(event: NodeEvent) -> bool:
+    "A mapping key that pulls in keys from elsewhere: `<<`, or an alias used as a key."
+
+    return isinstance(event, AliasEvent) or (isinstance(event, ScalarEvent) and event.value == "<<")
+
+
+def scan_job_names(stream: IO[bytes] | mmap.mmap, loader: type = SafeLoader) -> list[str] | None:
+    """
+    Walk the YAML event stream and collect the keys of the top-level `jobs`
+    mapping, without constructing the document (or evaluating any tags).
+    Stops as soon as the `jobs` mapping has been read.
+
+    Events don't expand aliases or tags, so the names can't be known from here, and
+    None is returned, when `jobs` isn't a plain mapping (an alias, or a tagged node
+    like `!include jobs.yaml`), or a merge key (`<<: *common`) appears at the top
+    level or among the jobs.
+    """
+
+    jobs: list[str] = []
+    frames: list[bool | None] = []  # per open collection: mapping expects a key next, or None for sequences
+    jobs_key: bool = False  # the last top-level key was `jobs`
+    in_jobs: bool = False
+    needs_load: bool = False  # only a full load can tell what jobs there are
+    events = yaml.parse(stream, Loader=loader)
+
+    for event in events:
+        if isinstance(event, NodeEvent):
+            is_key: bool = bool(frames) and frames[-1] is True
+
+            if frames and frames[-1] is not None:
+                frames[-1] = not frames[-1]
+
+            if len(frames) == 1:
+                if is_key:
+                    if is_merge_key(event):  # may bring in a `jobs` of its own
+                        needs_load = True
+                        break
+                    jobs_key = isinstance(event, ScalarEvent) and event.value == "jobs"
+                elif jobs_key:
+                    if not isinstance(event, MappingStartEvent) or event.tag not in PLAIN_MAPPING_TAGS:
+                        needs_load = True  # jobs: *other, jobs: !include ..., etc.
+                        break
+                    in_jobs = True
+            elif len(frames) == 2 and in_jobs and is_key:
+                if is_merge_key(event):
+                    needs_load = True
+                    break
+                if isinstance(event, ScalarEvent):
+                    jobs.append(str(event.value))
+
+            if isinstance(event, MappingStartEvent):
+                frames.append(True)
+            elif isinstance(event, SequenceStartEvent):
+                frames.append(None)
+
+        elif isinstance(event, CollectionEndEvent):
+            frames.pop()
+            if in_jobs and len(frames) == 1:
+                break
+
+    events.close()  # release the parser (and its hold on the stream) now that we stopped early
+
+    return None if needs_load else jobs
 
 
-def get_project_jobs(project: Path) -> list[str]:
-    conf: dict[str, Any] = {}
+def load_job_names(project: Path) -> list[str]:
+    "Load the whole project with the adhd loader, which expands aliases and merge keys."
+
+    from lib.loader import get_loader, load_yaml  # heavy, and only needed for projects the scan can't handle
+
+    conf: dict[str, Any] = load_yaml(project.read_bytes(), get_loader()) or {}
+
+    return [str(key) for key in conf.get("jobs") or []]
+
+
+def scan_with_fallback(stream: IO[bytes] | mmap.mmap) -> list[str] | None:
+    """
+    Scan with libyaml, and again with the pure Python parser if libyaml rejects the
+    document (e.g. plain scalars containing `:` in flow sequences, `[ http://host/ ]`).
+    """
 
     try:
-        conf = yaml.load(open(project, "r"), Loader=get_loader())
+        return scan_job_names(stream)
+    except (ScannerError, ParserError):
+        if SafeLoader is PySafeLoader:
+            raise
+        stream.seek(0)
+        return scan_job_names(stream, loader=PySafeLoader)
+
+
+def get_project_jobs(project: Path) -> list[str] | None:
+    "Job names for a project, or None if it couldn't be read or parsed."
+
+    jobs: list[str] | None
+
+    try:
+        with open(project, "rb") as f:
+            if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+                jobs = scan_with_fallback(f)
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    jobs = scan_with_fallback(mm)
+        return load_job_names(project) if jobs is None else jobs
+    except:
+        return None
+
+
+def get_cached_jobs(project: Path, st: os.stat_result) -> list[str]:
+    """
+    Return the jobs for a project from its sidecar cache, e.g. `.foo.completions`
+    for `foo.yaml`, re-scanning the YAML only when its mtime or size has changed.
+    """
+
+    cache: Path = project.with_name(f".{project.stem}.completions")
+    key: tuple[int, int, int] = (CACHE_VERSION, st.st_mtime_ns, st.st_size)
+
+    try:  # an unreadable or outdated cache (e.g. the old JSON format) is just a miss
+        with cache.open("rb") as f:
+            cached: dict[str, Any] = pickle.load(f)
+        if cached["key"] == key:
+            return cached["jobs"]
     except:
         pass
 
-    return list(str(key) for key in conf.get("jobs", []))
+    jobs: list[str] | None = get_project_jobs(project)
+
+    if jobs is None:  # a failed parse isn't cached, so fixing the project (or adhd) fixes completion
+        return []
+
+    # write-then-rename so a concurrent or interrupted completion never sees half a cache
+    tmp: Path = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            pickle.dump({"key": key, "jobs": jobs}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+    return jobs
 
 
-def load_projects(home: str) -> dict[str, list[str]]:
-    install_home = Path(f"~/.{home}").expanduser().resolve()
-    projects_home = install_home / "projects"
-    cache: Path = projects_home / ".completion.cache"
-    cache_dirty: bool = False
-    projects: dict[str, list[str]] = {}
+def get_projects_home(home: str) -> Path:
+    "return path to project files, e.g. ~/.adhd/projects"
 
-    if cache.exists():
-        projects = json.load(cache.open("r"))
+    if install_home := os.environ.get(f"{home.upper()}_HOME"):  # already resolved by the user
+        return Path(install_home) / "projects"
 
-    for project in projects_home.glob("*.yaml"):
-        if not project.stem in projects or project.stat().st_mtime > cache.stat().st_mtime:
-            projects[project.stem] = get_project_jobs(project)
-            cache_dirty = True
+    return Path(f"~/.{home}").expanduser().resolve() / "projects"
 
-    if cache_dirty:
-        cache.open("w").write(json.dumps(projects))
 
-    return projects
+def list_projects(projects_home: Path) -> list[str]:
+    "Project names are just the YAML filenames; nothing needs to be parsed."
+
+    with os.scandir(projects_home) as it:
+        return [e.name[:-5] for e in it if e.name.endswith(".yaml") and not e.name.startswith(".")]
 
 
 def completion_hook(cmd: str, curr_word: str, prev_word: str) -> list[str]:
-    projects: dict[str, list[str]] = load_projects(home=cmd)
+    projects_home: Path = get_projects_home(cmd)
+    project: Path = projects_home / f"{prev_word}.yaml"
+    st: os.stat_result | None = None
+
+    if prev_word and not prev_word.startswith(".") and "/" not in prev_word:
+        try:
+            st = project.stat()
+        except OSError:
+            pass
 
-    if prev_word in projects:
-        jobs = projects[prev_word]
-        return [j for j in jobs if j.startswith(curr_word)]
+    # completing a job: only the selected project is read
+    if st is not None and stat.S_ISREG(st.st_mode):
+        return [j for j in get_cached_jobs(project, st) if j.startswith(curr_word)]
 
+    # completing the project name: a directory listing is all we need
     elif prev_word == cmd:
-        return [p for p in projects if p.startswith(curr_word)]
+        return [p for p in list_projects(projects_home) if p.startswith(curr_word)]
 
     return []
 
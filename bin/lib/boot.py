@@ -2,7 +2,8 @@
 This module must not import any optional dependencies, nor import from elsewhere in lib/.
 """
 
-import importlib
+import importlib.util
+import os
 import shutil
 
 
@@ -11,8 +12,12 @@ def missing_modules(required: dict[str, str]) -> list[str]:
 
     for req in required:
         try:
-            importlib.import_module(req)
-        except ModuleNotFoundError:
+            # locate the module without executing it
+            found: bool = importlib.util.find_spec(req) is not None
+        except ModuleNotFoundError:  # parent package of a dotted name is missing
+            found = False
+
+        if not found:
             # return the package name, not module name
             missing.append(required[req])
 
@@ -20,11 +25,19 @@ def missing_modules(required: dict[str, str]) -> list[str]:
 
 
 def missing_binaries(required: list[str]) -> list[str]:
-    missing: list[str] = []
-
-    for req in required:
-        path = shutil.which(req)
-        if path is None:
-            missing.append(req)
+    pending: set[str] = set(required)
 
-    return missing
+    # list each PATH directory once, rather than probing it once per binary
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        if not pending:
+            break
+        try:
+            with os.scandir(directory or os.curdir) as entries:
+                for entry in entries:
+                    if entry.name in pending and not entry.is_dir() and os.access(entry.path, os.X_OK):
+                        pending.discard(entry.name)
+        except OSError:
+            continue
+
+    # anything left over gets a second opinion: paths, case-insensitive filesystems, PATHEXT
+    return [req for req in required if req in pending and shutil.which(req) is None]
@@ -1,6 +1,7 @@
 import sys
+from collections import ChainMap
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any, Generator, Iterable, Mapping
 
 import filelock
 import rich.prompt
@@ -12,60 +13,101 @@ from .util import (
     Style,
     console,
     get_resolved_path,
+    get_resolved_path_str,
     get_sorted_deps,
     realize,
+    realize_many,
     resolve_dependencies,
 )
 
 # ==============================================================================
 
 
+def get_referenced_vars(values: Iterable[Any], env: Mapping[str, Any]) -> list[str]:
+    "Names of the variables in env that values depend on, directly or through other variables."
+
+    found: set[str] = set()
+    pending: list[Any] = list(values)
+
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, LazyValue):
+            for name in value.dependencies - found:
+                if name in env:
+                    found.add(name)
+                    pending.append(env[name])
+
+    return sorted(found)
+
+
 def get_job(
     command: tuple[str, ...] | list[str] | str,
     job_config: ConfigBox,
-    project_config: ConfigBox,
+    default_home: str | LazyValue,  # project-level home and tmp, used unless the job overrides them
+    default_tmp: str | LazyValue,
     process_env: ConfigBox,
     explain: bool = False,  # don't _eval values that we don't need
+    resolved_base_env: ConfigBox | None = None,  # process_env, already resolved by the caller
 ) -> ConfigBox:
     "Build a job structure from configuration."
 
-    env: ConfigBox = ConfigBox({**process_env, **job_config.get("env", {})})
-    home: str | LazyValue = job_config.get("home") or project_config.get("home", ".")
-    tmp: str | LazyValue = job_config.get("tmp") or project_config.get("tmp", "./tmp")
+    job_env: dict[str, Any] = job_config.get("env", {})
+    base_env: ConfigBox = process_env if resolved_base_env is None else resolved_base_env
+    # job variables layered over the shared env; writes land in the job's layer only
+    env: ChainMap[str, Any] = ChainMap(ConfigBox(job_env), base_env)
+    home: str | LazyValue = job_config.get("home") or default_home
+    tmp: str | LazyValue = job_config.get("tmp") or default_tmp
     workdir: Path = get_resolved_path(home, env=env)
-    tmpdir: Path = get_resolved_path(tmp, env=env)
+    tmpdir: str = get_resolved_path_str(tmp, env=env)
+
+    # resolved in place, so everything realized below sees the final values
+    if not explain:
+        if resolved_base_env is None:
+            resolve_dependencies(env, workdir=workdir)
+        else:  # only the job's own variables still need resolving
+            resolve_dependencies(env, workdir=workdir, keys=job_env)
+    else:  # explain only shows help and tasks, so only what those reference is resolved;
+        # other variables stay unresolved, so explaining never runs their commands
+        shown: list[Any] = [job_config.get("help"), job_config.get("run")]
+        resolve_dependencies(env, workdir=workdir, keys=get_referenced_vars(shown, env))
+
     cmd: Any = realize(job_config.get("run", []), workdir=workdir, env=env)
     run: list = cmd if isinstance(cmd, list) else [cmd]
-    run_env: dict[str, str] = resolve_dependencies(
-        ConfigBox({**process_env, **job_config.get("env", {})}),
-        workdir=workdir,
-    )
     after: list[str] = _after if isinstance((_after := job_config.get("after", [])), list) else [_after]
 
     job: ConfigBox = ConfigBox(
         {
             "after": after,
-            "env": ConfigBox(realize({**env, **run_env}, workdir=workdir, env=env)),
+            # Box converts nested dicts on insert, so hand it a plain dict exactly once
+            "env": job_env if explain else realize(dict(env), workdir=workdir, env=env),
             "help": realize(job_config.get("help", "No help available."), workdir=workdir, env=env),
             "lock": job_config.get("lock", True),
             "name": command,
-            "open": realize(job_config.get("open"), workdir=workdir, env=env),
+            "open": job_config.get("open"),
             "run": run,
-            "tmp": str(tmpdir),
+            "tmp": tmpdir,
             "workdir": str(workdir),
         }
     )
 
     if not explain:
-        job.update(  # these are potentially expensive, and may not run if deps aren't installed
+        # these are potentially expensive, and may not run if deps aren't installed
+        extra: dict[str, Any] = realize_many(
             {
-                "capture": realize(job_config.get("capture", False), workdir=workdir, env=env),
-                "confirm": realize(job_config.get("confirm"), workdir=workdir, env=env),
-                "interactive": realize(job_config.get("interactive", False), workdir=workdir, env=env),
-                "skip": realize(job_config.get("skip", lambda *_, **__: False), workdir=workdir, env=env),
-                "sleep": int(realize(job_config.get("sleep", 0), workdir=workdir, env=env)),
-            }
+                "open": job_config.get("open"),
+                "capture": job_config.get("capture", False),
+                "confirm": job_config.get("confirm"),
+                "interactive": job_config.get("interactive", False),
+                "skip": job_config.get("skip", lambda *_, **__: False),
+                "sleep": job_config.get("sleep", 0),
+            },
+            workdir=workdir,
+            env=env,
         )
+        extra["sleep"] = int(extra["sleep"])
+        job.update(extra)
 
         required: set[str] = {"run", "after", "open"}
         configured: set[str] = set(k for k, v in job.items() if v)
@@ -124,6 +166,9 @@ def get_jobs(
                 if rich.prompt.Confirm.ask("Would you like to abort?", default=True, console=console):
                     raise SystemExit("Aborted by user request.\n")
 
+        # resolved in place, so env added by plugins during the loop is still seen
+        resolved_env: ConfigBox = resolve_dependencies(process_env, workdir=workdir)
+
         for dep in get_sorted_deps(_cmd, jobs, workdir=workdir, env=process_env):
             job_config: ConfigBox = jobs.get(dep, {})
 
@@ -132,7 +177,15 @@ def get_jobs(
                     continue
 
             try:
-                yield get_job(dep, job_config, project_config, process_env, explain=explain)
+                yield get_job(
+                    dep,
+                    job_config,
+                    home,
+                    tmp,
+                    process_env,
+                    explain=explain,
+                    resolved_base_env=resolved_env,
+                )
             except Exception as e:
                 console.print(f"{Style.ERROR} job [bold cyan]{_cmd}[/] failed: [bold white]{e}[/]")
                 if debug:
@@ -1,41 +1,84 @@
 import os
+import pickle
 import re
+import sys
+from collections import ChainMap
 from datetime import datetime
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Callable, cast
+from typing import Any, Callable, Sequence, cast
 
 import ruamel.yaml as yaml
 from ruamel.yaml import ScalarNode, SequenceNode
-from ruamel.yaml.loader import SafeLoader
+
+from ruamel.yaml.loader import SafeLoader as PySafeLoader
+from ruamel.yaml.parser import ParserError
+from ruamel.yaml.scanner import ScannerError
+
+try:  # libyaml bindings are an optional part of ruamel.yaml
+    from ruamel.yaml.cyaml import CSafeLoader as SafeLoader
+except ImportError:
+    SafeLoader = PySafeLoader  # type: ignore
 
 from yarl import URL
 
 from .shell import shell
-from .util import ConfigBox, LazyValue, console, get_resolved_path, realize
+from .util import ConfigBox, LazyValue, console, get_resolved_path_str, realize
 
 # ==============================================================================
 
-builtins: dict[str, Any] = {
-    "__DATE__": datetime.now().strftime("%Y%m%d"),
-    "__TIME__": datetime.now().strftime("%H%M%S"),
-}
+builtins: dict[str, Any] = {}  # filled on first use, see get_builtins()
+environ: dict[str, str] = {}  # plain copy of os.environ, see get_environ()
+
+env_var_regex = re.compile(r"\$\{(\w+)\}")  # ${VAR}
+no_deps: frozenset[str] = frozenset()  # shared by every value without references
+interned_deps: dict[frozenset[str], frozenset[str]] = {no_deps: no_deps}  # one object per distinct set
+memo_size: int = 8  # substitutions remembered per LazyValue
+parsed_cache_version: int = 1  # bump when what load_project pickles changes shape or meaning
 
 # ==============================================================================
 
 
-def find_deps(value: str | list[str]) -> set[str]:
-    "Locate all env vars in a string and mark them as dependencies."
-    deps: set[str] = set()
+def get_builtins() -> dict[str, Any]:
+    "Variables provided by adhd itself, stamped from a single clock reading on first use."
+
+    if not builtins:
+        now: datetime = datetime.now()
+        builtins["__DATE__"] = now.strftime("%Y%m%d")
+        builtins["__TIME__"] = now.strftime("%H%M%S")
+
+    return builtins
+
+
+def get_environ() -> dict[str, str]:
+    """
+    Snapshot of the process environment, taken on first use.
+    os.environ encodes and decodes on every lookup; adhd never writes to it
+    (plugins hand back env instead), so one copy serves the whole run.
+    """
+
+    if not environ:
+        environ.update(os.environ)
+
+    return environ
 
-    if isinstance(value, list):
-        for v in value:
-            deps.update(find_deps(v))
-    elif isinstance(value, str):
-        if match := re.findall(r"\${(\w+)}", value):
-            deps.update(match)
 
-    return deps
+def find_deps(value: str | Sequence | LazyValue) -> frozenset[str]:
+    "Locate all env vars in a string, sequence, or nested tag and mark them as dependencies."
+
+    deps: frozenset[str]
+
+    if isinstance(value, (list, tuple)):
+        deps = no_deps.union(*map(find_deps, value))
+    elif isinstance(value, LazyValue):  # nested tag, already scanned when it was constructed
+        return value.dependencies
+    elif isinstance(value, str) and "${" in value:  # most values have no references at all
+        # names recur across values
+        deps = frozenset(sys.intern(m.group(1)) for m in env_var_regex.finditer(value))
+    else:
+        return no_deps
+
+    return interned_deps.setdefault(deps, deps)
 
 
 # ==============================================================================
@@ -55,19 +98,51 @@ def populate_env_var(
     if env is None:
         env = ConfigBox()
 
-    if future.dependencies:
-        full_value: str = realize(value)
-        for g in future.dependencies:
-            if _v := os.environ.get(g, env.get(g, builtins.get(g))):
-                full_value = full_value.replace(f"${{{g}}}", realize(_v, workdir=workdir, env=env))
+    if future.dependencies is not no_deps and isinstance(value, str) and "${" in value:
+        lookup: ChainMap[str, Any] = ChainMap(get_environ(), env, get_builtins())  # first match wins
+        found: dict[str, Any] = {g: lookup.get(g) for g in future.dependencies}
+
+        # substitution is pure when everything involved is already a plain string
+        memoizable: bool = all(v is None or isinstance(v, str) for v in found.values())
+        key: tuple[Any, ...] = (value, workdir, tuple(found.values()))
+
+        if memoizable and key in future.memo:
+            return future.memo[key]
+
+        def substitute(match: re.Match) -> str:
+            "Replace one ${VAR}, leaving unknown or empty variables for the shell."
+            if _v := found.get(match.group(1)):
+                return realize(_v, workdir=workdir, env=env)
+            return match.group(0)
+
+        full_value: str = env_var_regex.sub(substitute, value)
+
+        if memoizable:
+            if len(future.memo) >= memo_size:
+                del future.memo[next(iter(future.memo))]  # oldest first
+            future.memo[key] = full_value
+
         return full_value
-    return realize(value, workdir=workdir, env=env)
+    return realize(value, workdir=workdir, env=env)  # nested tags carry their own deps
+
 
+def split_env_vars(value: tuple) -> tuple:
+    "Give each item that references variables its own LazyValue, so it only looks up its own names."
 
-def construct_env_vars(loader: SafeLoader, node: ScalarNode) -> LazyValue:
-    "Returns a LazyValue that will call populate_env_var() later."
+    return tuple(
+        LazyValue(populate_env_var, v, deps) if isinstance(v, str) and (deps := find_deps(v)) is not no_deps else v
+        for v in value
+    )
+
+
+def construct_env_vars(loader: SafeLoader, node: ScalarNode) -> LazyValue | str:
+    "Returns a LazyValue that will call populate_env_var() later, or the literal if there's nothing to populate."
     value: str = str(loader.construct_scalar(cast(Any, node)))
-    return LazyValue(populate_env_var, value, find_deps(value))
+
+    if not (deps := find_deps(value)):
+        return value
+
+    return LazyValue(populate_env_var, value, deps)
 
 
 # ==============================================================================
@@ -145,134 +220,296 @@ def construct_shell(shell: Callable, loader: SafeLoader, node: ScalarNode) -> La
 def eval_cat(
     sep: str,
     future: LazyValue,
-    value: list,
+    value: Sequence,
     workdir: Path | None = None,
     env: ConfigBox | None = None,
 ) -> str:
-    evaled: list[str] = [populate_env_var(future, v, env, workdir) for v in value]
+    evaled: list[str] = [realize(v, workdir=workdir, env=env) for v in value]
     return sep.join(evaled)
 
 
-def construct_cat(sep: str, loader: SafeLoader, node: SequenceNode) -> LazyValue:
+def construct_cat(sep: str, loader: SafeLoader, node: SequenceNode) -> LazyValue | str:
     "Concatenate list of strings together with `sep` between each item."
 
-    value: list = loader.construct_sequence(cast(Any, node))
-    return LazyValue(partial(eval_cat, sep), value, find_deps(value))
+    value: tuple = tuple(loader.construct_sequence(cast(Any, node)))  # read-only from here on
+    deps: frozenset[str] = find_deps(value)
+
+    if not deps and all(isinstance(v, str) for v in value):
+        return sep.join(value)  # nothing deferred, so join now
+
+    return LazyValue(partial(eval_cat, sep), split_env_vars(value), deps)
+
+
+# ==============================================================================
+
+
+def collect_items(loader: SafeLoader, node: ScalarNode | SequenceNode, tag: str) -> tuple[tuple, frozenset[str]]:
+    "Construct a scalar or sequence node as a tuple of items, along with its dependencies."
+
+    value: tuple = (
+        tuple(loader.construct_sequence(cast(Any, node)))
+        if isinstance(node, SequenceNode)
+        else (str(loader.construct_scalar(cast(Any, node))),)
+    )
+
+    if not value:
+        raise TypeError(f"{tag} requires at least one item")
+
+    return value, find_deps(value)
 
 
 # ==============================================================================
 
 
-def eval_path(future: LazyValue, value: list, workdir: Path, env: ConfigBox | None = None) -> str:
+def resolve_path_str(path: str, env: ConfigBox | None = None, workdir: Path | None = None) -> str:
+    "Normalize a joined !path."
+
+    if path.startswith("/") and ".." not in path:  # nothing to expand, so skip realpath()
+        return os.path.normpath(path)
+
+    return get_resolved_path_str(path, env=env, workdir=workdir)
+
+
+def eval_path(future: LazyValue, value: Sequence, workdir: Path, env: ConfigBox | None = None) -> str:
     evaled: list[str] = [v(env=env, workdir=workdir) if isinstance(v, LazyValue) else v for v in value]
-    path: Path = get_resolved_path("/".join(evaled), env=env, workdir=workdir)
 
-    return str(path)
+    return resolve_path_str("/".join(evaled), env=env, workdir=workdir)
+
 
+def eval_joined_path(future: LazyValue, value: str, workdir: Path, env: ConfigBox | None = None) -> str:
+    return resolve_path_str(value, env=env, workdir=workdir)
 
-def construct_path(loader: SafeLoader, node: SequenceNode) -> LazyValue:
+
+def construct_path(loader: SafeLoader, node: SequenceNode) -> LazyValue | str:
     "Concatenate list of strings into normalized path."
 
-    value: list = []
+    value, deps = collect_items(loader, node, "!path")
 
-    if isinstance(node, SequenceNode):
-        value = loader.construct_sequence(cast(Any, node))
-    else:
-        _v = loader.construct_scalar(node)
-        value = [_v]
+    if not deps and all(isinstance(v, str) for v in value):
+        path: str = "/".join(value)
 
-    if not value:
-        raise TypeError("!path requires at least one item")
+        # plain absolute paths only need normalizing, which touches neither the filesystem
+        # nor the environment, so fold them now; ~ depends on HOME and `..` on symlinks,
+        # and parsed documents are cached across runs
+        if path.startswith("/") and ".." not in path:
+            return os.path.normpath(path)
+
+        return LazyValue(eval_joined_path, path, deps)  # relative: join now, resolve later
 
-    return LazyValue(eval_path, value, find_deps(value))
+    return LazyValue(eval_path, value, deps)
 
 
 # ==============================================================================
 
 
-def eval_exists(exists: bool, future: LazyValue, value: list, workdir: Path, env: ConfigBox) -> bool:
+def eval_exists(exists: bool, future: LazyValue, value: Sequence, workdir: Path, env: ConfigBox) -> bool:
     evaled: list[str] = [v(env=env, workdir=workdir) if isinstance(v, LazyValue) else v for v in value]
-    path: Path = get_resolved_path("/".join(evaled), env=env, workdir=workdir)
+    path: str = get_resolved_path_str("/".join(evaled), env=env, workdir=workdir)
 
-    return path.exists() == exists
+    return os.path.exists(path) == exists  # never cached, the answer may change between jobs
 
 
 def construct_exists(exists: bool, loader: SafeLoader, node: SequenceNode) -> LazyValue:
     "Check if all of a list of files exists."
 
-    value: list = []
+    value, deps = collect_items(loader, node, "!exists" if exists else "!not_exists")
 
-    if isinstance(node, SequenceNode):
-        value = loader.construct_sequence(cast(Any, node))
-    else:
-        _v = loader.construct_scalar(node)
-        value = [_v]
+    return LazyValue(partial(eval_exists, exists), value, deps)
 
-    if not value:
-        raise TypeError("!path requires at least one item")
 
-    return LazyValue(partial(eval_exists, exists), value, find_deps(value))
+# ==============================================================================
 
 
-# ==============================================================================
+@lru_cache(maxsize=256)
+def normalize_url(url: str) -> str:
+    "Parse and re-serialize a URL; realizing the same !url repeatedly only pays for this once."
 
+    return str(URL(url))
 
-def eval_url(exists: bool, future: LazyValue, value: list, workdir: Path, env: ConfigBox) -> str:
-    evaled: list[str] = [populate_env_var(future, v, env, workdir) for v in value]
-    url: URL = URL("/".join(evaled))
 
-    return str(url)
+def eval_url(future: LazyValue, value: Sequence, workdir: Path, env: ConfigBox) -> str:
+    evaled: list[str] = [realize(v, workdir=workdir, env=env) for v in value]
 
+    return normalize_url("/".join(evaled))
 
-def construct_url(loader: SafeLoader, node: SequenceNode) -> LazyValue:
-    "Concatenate list of strings with no spaces and see if its a url. Exciting stuff."
 
-    value: list[str] = []
+def construct_url(loader: SafeLoader, node: SequenceNode) -> LazyValue | str:
+    "Concatenate list of strings with no spaces and see if its a url. Exciting stuff."
 
-    if isinstance(node, SequenceNode):
-        value = loader.construct_sequence(cast(Any, node))
-    else:
-        _v = str(loader.construct_scalar(node))
-        value = [_v]
+    value, deps = collect_items(loader, node, "!url")
 
-    if not value:
-        raise TypeError("!url requires at least one item")
+    if not deps and all(isinstance(v, str) for v in value):
+        return normalize_url("/".join(value))  # nothing deferred, so build it now
 
-    return LazyValue(eval_url, value, find_deps(value))
+    return LazyValue(eval_url, split_env_vars(value), deps)
 
 
 # ==============================================================================
 
 
+# (path, mtime, size, loader) -> (parsed document, the files it includes in turn)
+_includes: dict[tuple[Path, int, int, type], tuple[Any, dict[Path, tuple[int, int]]]] = {}
+
+# path -> (mtime, size) of every file included while loading the current project
+_included: dict[Path, tuple[int, int]] = {}
+
+
 def construct_include(loader: SafeLoader, node: ScalarNode) -> Any:
-    "Include another YAML file about here."
+    "Include another YAML file about here. Each file is parsed once per loader variant until it changes."
 
     include: Path = Path(str(loader.construct_scalar(cast(Any, node)))).expanduser().resolve()
+    st: os.stat_result = include.stat()
+    key: tuple[Path, int, int, type] = (include, st.st_mtime_ns, st.st_size, type(loader))
+    _included[include] = (st.st_mtime_ns, st.st_size)
+
+    if (cached := _includes.get(key)) is None or not _is_current(None, cached[1]):
+        outer: dict[Path, tuple[int, int]] = dict(_included)
+        _included.clear()  # collect just this file's own includes
+        try:
+            # one read, then libyaml parses from memory without calling back into Python for more
+            # input; same tags as the includer
+            cached = _includes[key] = (load_yaml(include.read_bytes(), type(loader)), dict(_included))
+        finally:
+            _included.update(outer)
+
+    # a cached document still depends on everything it included, so the caller records those too
+    _included.update(cached[1])
 
-    with open(include, "r") as f:
-        result = yaml.load(f, Loader=cast(Any, SafeLoader))
-        return result
+    # shared, not copied: ConfigBox rebuilds every dict and list it's given, so the
+    # cached document is never what ends up being mutated
+    return cached[0]
 
 
 # ==============================================================================
 
 
-def get_loader(debug: bool = False) -> type[SafeLoader]:
-    "YAML loader with sweet custom tags."
+# tags whose constructors are the same for every loader variant
+constructors: dict[str, Callable] = {
+    "!env": construct_env_vars,
+    "!cat": partial(construct_cat, ""),
+    "!cats": partial(construct_cat, " "),
+    "!catn": partial(construct_cat, "\n"),
+    "!url": construct_url,
+    "!path": construct_path,
+    "!include": construct_include,
+    "!exists": partial(construct_exists, True),
+    "!not_exists": partial(construct_exists, False),
+}
 
-    loader: type[SafeLoader] = SafeLoader
 
-    loader.add_constructor("!env", construct_env_vars)
-    loader.add_constructor("!shell_eq_0", partial(construct_shell, partial(shell_eq_0, debug=debug)))
-    loader.add_constructor("!shell_neq_0", partial(construct_shell, partial(shell_neq_0, debug=debug)))
-    loader.add_constructor("!shell_stdout", partial(construct_shell, partial(shell_stdout, debug=debug)))
-    loader.add_constructor("!cat", partial(construct_cat, ""))
-    loader.add_constructor("!cats", partial(construct_cat, " "))
-    loader.add_constructor("!catn", partial(construct_cat, "\n"))
-    loader.add_constructor("!url", construct_url)
-    loader.add_constructor("!path", construct_path)
-    loader.add_constructor("!include", construct_include)
-    loader.add_constructor("!exists", partial(construct_exists, True))
-    loader.add_constructor("!not_exists", partial(construct_exists, False))
+@lru_cache(maxsize=4)
+def get_loader(debug: bool = False, loader: type[SafeLoader] = SafeLoader) -> type[SafeLoader]:
+    """
+    YAML loader with sweet custom tags.
+    Tags are bound in the class dict of a subclass of `loader`, built once per variant.
+    """
+
+    shells: dict[str, Callable] = {
+        "!shell_eq_0": partial(construct_shell, partial(shell_eq_0, debug=debug)),
+        "!shell_neq_0": partial(construct_shell, partial(shell_neq_0, debug=debug)),
+        "!shell_stdout": partial(construct_shell, partial(shell_stdout, debug=debug)),
+    }
+    yaml_constructors: dict[Any, Callable] = {**loader.yaml_constructors, **constructors, **shells}
+    # the same tags on the pure Python parser, for documents libyaml rejects (see load_yaml)
+    fallback: type | None = None if loader is PySafeLoader else get_loader(debug=debug, loader=PySafeLoader)
+
+    return cast(
+        type[SafeLoader],
+        type("AdhdLoader", (loader,), {"yaml_constructors": yaml_constructors, "fallback": fallback}),
+    )
+
+
+def load_yaml(data: bytes, loader: type[SafeLoader] = SafeLoader) -> Any:
+    """
+    Parse data with loader, libyaml-backed when available. libyaml rejects some YAML the
+    pure Python parser accepts, e.g. plain scalars containing `:` in flow sequences
+    (`open: [ http://localhost:8000/ ]`), so such documents are parsed again without it.
+    Nothing is constructed before libyaml gives up, so the retry has no side effects to undo.
+    """
+
+    try:
+        return yaml.load(data, Loader=cast(Any, loader))
+    except (ScannerError, ParserError):
+        fallback: type | None = getattr(loader, "fallback", PySafeLoader if loader is SafeLoader else None)
+        if fallback is None or fallback is loader:
+            raise
+        return yaml.load(data, Loader=cast(Any, fallback))
+
+
+# ==============================================================================
+
+
+# (project, mtime, size, debug) -> (cwd or None, included files, document), for loads
+# repeated within one process; the sidecar below covers separate runs
+_projects: dict[tuple[Path, int, int, bool], tuple[str | None, dict[Path, tuple[int, int]], Any]] = {}
+
+
+def invalidate() -> None:
+    "Forget every parsed project and include held in memory. The on-disk sidecars are left alone."
+
+    _projects.clear()
+    _includes.clear()
+
+
+def _is_current(cwd: str | None, includes: dict[Path, tuple[int, int]]) -> bool:
+    "Whether a parse recorded with this cwd and these includes still holds."
+
+    try:
+        return cwd in (None, os.getcwd()) and all(  # includes are resolved against the working directory
+            ((_st := os.stat(p)).st_mtime_ns, _st.st_size) == v for p, v in includes.items()
+        )
+    except OSError:  # an include was removed
+        return False
+
+
+@lru_cache(maxsize=1)
+def get_code_stamp() -> tuple[int, ...]:
+    """
+    mtimes of the modules whose functions and folding rules end up in a parsed document,
+    so an in-place update of adhd (git pull, adhd-update) invalidates every sidecar.
+    """
+
+    modules: tuple[str, ...] = (__file__, cast(str, sys.modules[LazyValue.__module__].__file__))
+    return tuple(os.stat(m).st_mtime_ns for m in modules)
+
+
+def load_project(project: Path, debug: bool = False) -> Any:
+    """
+    Parse a project file with the adhd loader.
+    The parsed document is pickled to a `.{stem}.parsed` sidecar next to the project,
+    and reused for as long as the project, the files it includes, `debug`, and adhd's
+    own loader code are unchanged.
+    The returned document is shared, treat it as read-only.
+    """
 
-    return loader
+    cache: Path = project.with_name(f".{project.stem}.parsed")
+    st: os.stat_result = project.stat()
+    key: tuple = (parsed_cache_version, get_code_stamp(), st.st_mtime_ns, st.st_size, debug)
+    mem_key: tuple[Path, int, int, bool] = (project.resolve(), st.st_mtime_ns, st.st_size, debug)
+
+    try:
+        if (held := _projects.get(mem_key)) and _is_current(held[0], held[1]):
+            return held[2]
+
+        with open(cache, "rb") as f:
+            cached_key, cwd, includes, document = pickle.load(f)
+        if cached_key == key and _is_current(cwd, includes):
+            _projects[mem_key] = (cwd, includes, document)
+            return document
+    except Exception:
+        pass  # missing, stale, or unreadable: parse it again
+
+    _included.clear()
+    document = load_yaml(project.read_bytes(), get_loader(debug=debug))
+    entry = _projects[mem_key] = (os.getcwd() if _included else None, dict(_included), document)
+    tmp: Path = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+
+    try:  # written atomically, so a concurrent run never sees half a cache
+        # owner-only, like the project file itself; it holds the project and its includes
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+            pickle.dump((key, *entry), f)
+        os.replace(tmp, cache)
+    except Exception:
+        tmp.unlink(missing_ok=True)  # not worth failing over, we'll parse next time too
+
+    return document
@@ -1,10 +1,8 @@
+import os
 import subprocess
-from io import StringIO
 from pathlib import Path
 
-from dotenv import dotenv_values
-
-from .util import ConfigBox
+from .util import ConfigBox, get_resolved_path_str
 
 # ==============================================================================
 
@@ -18,8 +16,8 @@ def shell(
 ) -> subprocess.CompletedProcess[bytes]:
     "Executes command in subshell and return CompletedProcess object."
 
-    if workdir:
-        workdir = workdir.expanduser().resolve()
+    # memoized realpath; existence is checked every time, an earlier job may create it
+    cwd: str | None = get_resolved_path_str(str(workdir), env=None) if workdir else None
 
     result: subprocess.CompletedProcess[bytes]
 
@@ -30,8 +28,10 @@ def shell(
         result = subprocess.run(
             args=command,
             shell=True,
-            cwd=workdir if workdir and workdir.exists() else None,
-            env={k: str(v) for k, v in env.items()},
+            cwd=cwd if cwd and os.path.exists(cwd) else None,
+            # mostly str already; values still unresolved (e.g. under --explain) are left out
+            # rather than handed to the command as an object repr
+            env={k: v if type(v) is str else str(v) for k, v in env.items() if not callable(v)},
             capture_output=capture,
             stdout=subprocess.PIPE if not (interactive or capture) else None,
             stderr=subprocess.PIPE if not (interactive or capture) else None,
@@ -48,12 +48,25 @@ def shell(
 def source(command: str | Path, env: ConfigBox, workdir: Path) -> dict:
     "Source a shell script and import its environment."
 
-    _env: dict[str, str | None] = {}
+    _env: dict[str, str] = {}
     process: subprocess.CompletedProcess | None = None
 
     process = shell(f"source {command} && env", workdir=workdir, env=env, capture=True)
 
     if isinstance(process.stdout, bytes):
-        _env = dotenv_values(stream=StringIO(process.stdout.decode()))
+        key: str | None = None
+        # env(1) prints raw KEY=VALUE lines, no quoting; a line that doesn't look like
+        # an assignment continues the previous (multi-line) value. Entries that aren't
+        # variables, e.g. exported bash functions (`BASH_FUNC_which%%=() {`), are
+        # skipped along with their continuation lines
+        for line in process.stdout.decode().splitlines():
+            name, sep, value = line.partition("=")
+            if sep and name.isidentifier():
+                key = name
+                _env[key] = value
+            elif sep and name and not name[0].isspace() and " " not in name:
+                key = None  # a non-variable entry starts here
+            elif key:
+                _env[key] += "\n" + line
 
     return _env
@@ -1,17 +1,15 @@
+import os
 import sys
 import traceback
-from collections.abc import MutableMapping
-from enum import Enum
+from collections.abc import Iterable, Mapping, MutableMapping
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, TypeVar
 
 import click
 import rich.console
 import rich.style
 from box import Box
-from rich.syntax import Syntax
-from rich.table import Table
-from toposort import CircularDependencyError, toposort_flatten
 
 console: rich.console.Console = rich.console.Console(color_system="truecolor")
 
@@ -23,34 +21,34 @@ class LazyValue:
     """
     Object that proxies a value in the form of a function and its arguments,
     as well as a list of any dependencies on other values this value may have.
-    Specifically, this is used with toposort to linearly resolve inter-variable
+    Specifically, this is used with toposort_flatten to linearly resolve inter-variable
     references during reification.
 
     For example, given the variable reference `FOO: !env ${BAR} ${BAZ}`, `FOO` will
     have the dependencies `["BAR", "BAZ"]`, and during reification, `BAZ` and `BAR`
     are guaranteed to be evaluated before `FOO`, thereby ensuring the value of `FOO`
     can be calculated without the need for recursion.
+
+    `memo` is scratch space for evaluators whose result is a pure function of
+    their inputs, so repeated reification can skip the work.
     """
 
-    def __init__(self, fn: Callable, value: Any, deps: set[str]) -> None:
-        self.__fn: Callable = fn
-        self.__value: Any = value
-        self.__deps: set[str] = deps
+    __slots__ = ("_fn", "_value", "dependencies", "memo")
+
+    def __init__(self, fn: Callable, value: Any, deps: frozenset[str]) -> None:
+        self._fn: Callable = fn
+        self._value: Any = value
+        self.dependencies: frozenset[str] = deps  # read on every resolve, so a plain slot
+        self.memo: dict[Any, Any] = {}
 
     def __call__(self, *args, **kwargs: Any) -> str:
         "Reify this value."
 
-        return self.__fn(self, self.__value, *args, **kwargs)
-
-    @property
-    def dependencies(self) -> set[str]:
-        "Return the list of dependencies."
-
-        return self.__deps
+        return self._fn(self, self._value, *args, **kwargs)
 
     @property
     def value(self) -> Any:
-        return self.__value
+        return self._value
 
 
 # ==============================================================================
@@ -58,7 +56,9 @@ class LazyValue:
 state_len: int = 9
 
 
-class Style(Enum):
+class Style:
+    "Console markup prefixes, as plain strings."
+
     JOB_UP = f"[bold green]:black_circle:[/]{'Finished':<{state_len}}"
     JOB_DOWN = f"[dim]:black_circle:[/]{'Stopped':<{state_len}}"
     JOB_RUN = f"[green]:black_circle:[/]{'Running':<{state_len}}"
@@ -91,9 +91,6 @@ class Style(Enum):
     DOWN = "[dim white]:black_circle:[/]"
     SKIP = "[dim white]:white_circle:[/]"
 
-    def __str__(self):
-        return self.value
-
 
 # ==============================================================================
 
@@ -184,23 +181,96 @@ def _exit(exc: Exception, returncode: int = 1, verbose: bool = False, debug: boo
 # ==============================================================================
 
 
-def resolve_dependencies(env: ConfigBox, workdir: Path) -> ConfigBox:
-    deps: dict[str, set] = {k: set() for k in env}
+class CircularDependencyError(ValueError):
+    "Raised when names depend on each other, directly or transitively."
+
+    def __init__(self, data: dict[str, set[str]]) -> None:
+        self.data: dict[str, set[str]] = data
+        cycle: str = ", ".join(f"{k!r}:{v!r}" for k, v in sorted(data.items()))  # as toposort words it
+        super().__init__(f"Circular dependencies exist among these items: {{{cycle}}}")
+
+
+def toposort_flatten(deps: Mapping[str, Iterable[str]]) -> list[str]:
+    """
+    Order the names in deps (and those they depend on) so each comes after its
+    dependencies. Kahn's algorithm, one level at a time, with each level sorted
+    by name, so the result is stable across runs.
+    """
+
+    waiting: dict[str, int] = {}  # name -> number of its dependencies not yet placed
+    dependents: dict[str, list[str]] = {}
+
+    for name, _deps in deps.items():
+        waiting.setdefault(name, 0)
+        for dep in _deps:
+            if dep != name:  # a self-reference isn't a cycle
+                waiting[name] += 1
+                waiting.setdefault(dep, 0)
+                dependents.setdefault(dep, []).append(name)
+
+    order: list[str] = []
+    ready: list[str] = sorted(name for name, count in waiting.items() if not count)
+
+    while ready:
+        order.extend(ready)
+        unblocked: list[str] = []
+
+        for name in ready:
+            for dependent in dependents.get(name, ()):
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    unblocked.append(dependent)
+
+        ready = sorted(unblocked)
+
+    if len(order) != len(waiting):
+        placed: set[str] = set(order)
+        # what's left of each unplaced name's dependencies, self-references dropped as above
+        raise CircularDependencyError(
+            {name: set(deps.get(name, ())) - placed - {name} for name in waiting if name not in placed}
+        )
+
+    return order
+
+
+# ==============================================================================
+
+EnvT = TypeVar("EnvT", bound=MutableMapping)
+
+# dependency tree -> reification order
+_resolve_order: dict[frozenset[tuple[str, frozenset[str]]], list[str]] = {}
+
+
+def resolve_dependencies(env: EnvT, workdir: Path, keys: Iterable[str] | None = None) -> EnvT:
+    """
+    Reify the LazyValues in env, in dependency order, in place.
+    If `keys` is given, only those entries are reified; the rest of env is
+    assumed to have been resolved already. A ChainMap overlay is accepted,
+    in which case results are written to its first mapping.
+    """
+
+    deps: dict[str, frozenset[str]] = {}
 
     # build dependency tree
-    for k, v in env.items():
-        deps[k] = getattr(v, "dependencies", set())
+    for k in env if keys is None else keys:
+        deps[k] = _v.dependencies if type(_v := env.get(k)) is LazyValue else frozenset()
+
+    # jobs often share variable sets (YAML anchors, common env blocks), so each
+    # distinct dependency tree is sorted only once per run
+    if (order := _resolve_order.get(shape := frozenset(deps.items()))) is None:
+        try:
+            order = _resolve_order[shape] = toposort_flatten(deps)
+        except CircularDependencyError as e:
+            _exit(e)
+            return env  # never gets here, but makes mypy happy
 
     # resolve dependencies and reify LazyValues
-    try:
-        for k in toposort_flatten(deps):
-            if _v := env.get(k):
-                if callable(_v):
-                    env[k] = str(_v(env=env, workdir=workdir))
-                else:
-                    env[k] = str(_v)
-    except CircularDependencyError as e:
-        _exit(e)
+    for k in order:
+        if _v := env.get(k):
+            if callable(_v):
+                env[k] = str(_v(env=env, workdir=workdir))
+            else:
+                env[k] = str(_v)
 
     return env
 
@@ -208,56 +278,75 @@ def resolve_dependencies(env: ConfigBox, workdir: Path) -> ConfigBox:
 # ==============================================================================
 
 
+# (id(commands), command) -> (commands, order); keeping a reference to `commands`
+# guarantees its id can't be recycled by another mapping while the entry lives
+_sorted_deps: dict[tuple[int, str], tuple[dict, list[str]]] = {}
+
+
 def get_sorted_deps(command: str, commands: dict, workdir: Path, env: ConfigBox) -> list[str]:
     """
     Build a dependency tree of jobs that require other jobs,
     and return a flattened list of job execution order.
+    The order is memoized per jobs mapping and command.
     """
 
-    def get_deps(cmd: str) -> dict[str, list]:
-        deps: dict[str, list] = {cmd: []}
+    if (cached := _sorted_deps.get((id(commands), command))) and cached[0] is commands:
+        return list(cached[1])
+
+    deps: dict[str, list] = {}
+    pending: list[str] = [command]
+    commands_get: Callable = commands.get
 
-        if _deps := commands.get(cmd, {}).get("after"):
-            deps[cmd] = [_deps] if isinstance(_deps, str) else _deps
-            for _d in deps[cmd]:
-                try:
-                    deps.update(get_deps(_d))
-                except RecursionError:
-                    break  # will raise CircularDependencyError on return
-        return deps
+    # walk the `after` graph; a job already in deps is a shared dependency,
+    # or a cycle that toposort_flatten will report
+    while pending:
+        if (cmd := pending.pop()) in deps:
+            continue
+
+        _deps = commands_get(cmd, {}).get("after")
+        deps[cmd] = ([_deps] if isinstance(_deps, str) else _deps) if _deps else []
+        pending.extend(deps[cmd])
 
     try:
-        return toposort_flatten(get_deps(command))
+        order: list[str] = toposort_flatten(deps)
     except CircularDependencyError as e:
         _exit(e)
+        return []  # never gets here, but makes mypy happy
+
+    _sorted_deps[(id(commands), command)] = (commands, order)
 
-    return []  # never gets here, but makes mypy happy
+    return list(order)
+
+
+def clear_sorted_cache() -> None:
+    "Forget memoized job and variable orderings, e.g. after the jobs mapping was changed in place."
+
+    _sorted_deps.clear()
+    _resolve_order.clear()
 
 
 # ==============================================================================
 
 
-def check_permissions(paths: dict[Path, int], fix_perms: bool = False) -> bool:
-    "Validate permissions on program directories and files."
+# paths already found to have the required mode; insecure ones are checked every time
+_secure_paths: set[tuple[str, int]] = set()
 
-    def perm(p: Path) -> int | None:
-        "Return POSIX file permissions."
-        _perm: int = 0
 
-        try:
-            _perm = p.stat().st_mode & 0o000777
-        except Exception as e:
-            _exit(e)
+def check_permissions(paths: dict[Path, int], fix_perms: bool = False) -> bool:
+    "Validate permissions on program directories and files."
 
-        return _perm
+    insecure: list[tuple[Path, int]] = []
 
-    # fmt: off
-    insecure: list[tuple[Path, int]] = [
-        (p, required)
-        for p, required in paths.items()
-        if not perm(p) == required
-    ]
-    # fmt: on
+    try:
+        for p, required in paths.items():
+            if (key := (str(p), required)) in _secure_paths:
+                continue
+            if os.stat(p).st_mode & 0o000777 == required:
+                _secure_paths.add(key)
+            else:
+                insecure.append((p, required))
+    except OSError as e:  # a missing path is fatal, whichever one it is
+        _exit(e)
 
     if insecure:
         console.print(f"\nInsecure configuration:")
@@ -265,6 +354,7 @@ def check_permissions(paths: dict[Path, int], fix_perms: bool = False) -> bool:
         for path, mode in insecure:
             if fix_perms:
                 path.chmod(mode)
+                _secure_paths.add((str(path), mode))
                 console.print(f"- fixed {path} ({mode:04o})")
             else:
                 console.print(f"- chmod {mode:04o} {path}")
@@ -280,11 +370,16 @@ def check_permissions(paths: dict[Path, int], fix_perms: bool = False) -> bool:
 def nested_update(dst: ConfigBox, src: ConfigBox) -> ConfigBox:
     "Deep merge two nested dictionaries."
 
-    for key in src.keys():
-        if key in dst and isinstance(dst[key], MutableMapping) and isinstance(src[key], MutableMapping):
-            nested_update(dst=dst[key], src=src[key])
-        else:
-            dst[key] = src[key]
+    pending: list[tuple[dict, dict]] = [(dst, src)]
+
+    while pending:  # one (destination, source) pair per level of nesting
+        _dst, _src = pending.pop()
+        for key, value in _src.items():
+            # Box is a dict subclass, so the C-level check covers config boxes too
+            if isinstance(value, dict) and isinstance((_d := _dst.get(key)), dict):
+                pending.append((_d, value))
+            else:
+                _dst[key] = value
 
     return dst
 
@@ -310,23 +405,27 @@ def get_local_env(project_config: dict[str, Any], vars: dict[str, str]) -> Confi
 
 
 # ==============================================================================
+@lru_cache(maxsize=1)
 def get_program_name() -> str:
     "return name of program, e.g. adhd"
     program: Path = Path(sys.argv[0])
     return program.stem
 
 
+@lru_cache(maxsize=1)
 def get_program_bin() -> Path:
     "return path to installation bin dir, e.g. ~/.adhd/bin"
     program: Path = Path(sys.argv[0]).resolve()
     return program.parent
 
 
+@lru_cache(maxsize=1)
 def get_program_home() -> Path:
     "return path to installation, e.g. ~/.adhd"
     return get_program_bin().parent
 
 
+@lru_cache(maxsize=1)
 def get_project_home() -> Path | None:
     "return path to project"
     home: Path = Path(f"~/.{get_program_name()}").expanduser()
@@ -372,16 +471,18 @@ def print_job_help(jobs: dict, pager: str | bool = False, verbose=False) -> None
 
     width: int = max(len(j) for j in jobs) + 22
 
-    console.print()
+    lines: list[str] = [""]  # rendered in one print, surrounded by blank lines
     for job, config in jobs.items():
-        console.print(
-            f" :white_circle:{f'[bold cyan]{job}[/] [dim]':.<{width}}[/] {config.get('help', '')}",
-            highlight=False,
-        )
-    console.print()
+        lines.append(f" :white_circle:{f'[bold cyan]{job}[/] [dim]':.<{width}}[/] {config.get('help', '')}")
+    lines.append("")
+
+    console.print("\n".join(lines), highlight=False)
 
 
 def print_job_help_verbose(jobs: dict, pager: bool | str = False) -> None:
+    from rich.syntax import Syntax  # pulls in pygments, so only when asked for
+    from rich.table import Table
+
     table: Table = Table(
         show_header=False,
         padding=2,
@@ -423,13 +524,25 @@ def print_job_help_verbose(jobs: dict, pager: bool | str = False) -> None:
 # ==============================================================================
 
 
+def get_resolved_path_str(path: str | LazyValue, env: ConfigBox | None, workdir: Path | None = None) -> str:
+    "Resolves string or LazyValue into fully-qualified path, without building Path objects."
+
+    _path: str = path(env=env, workdir=workdir or Path(".")) if type(path) is LazyValue else path  # type: ignore
+    _path = _path if type(_path) is str else str(_path)
+    return _resolve_path_str(_path, "" if os.path.isabs(_path) else os.getcwd())
+
+
+@lru_cache(maxsize=256)
+def _resolve_path_str(path: str, cwd: str) -> str:
+    "Memoized realpath; `cwd` is only part of the key, since relative paths depend on it."
+
+    return os.path.realpath(os.path.expanduser(path))
+
+
 def get_resolved_path(path: str | LazyValue, env: ConfigBox | None, workdir: Path | None = None) -> Path:
     "Resolves string or LazyValue into fully-qualified path."
 
-    workdir = Path(".") if not workdir else workdir
-    _path: Path = Path(path(env=env, workdir=workdir) if isinstance(path, LazyValue) else path)
-    _path = _path.expanduser().resolve()
-    return _path
+    return Path(get_resolved_path_str(path, env=env, workdir=workdir))
 
 
 # ==============================================================================
@@ -485,10 +598,17 @@ def realize(v: Any, *args, **kwargs) -> Any:
 
     if isinstance(v, dict):
         for _k, _v in v.items():
-            v[_k] = realize(_v, *args, **kwargs)
+            if _v and (callable(_v) or isinstance(_v, (dict, list, tuple))):
+                v[_k] = realize(_v, *args, **kwargs)  # static leaves are left alone
         return v
     elif isinstance(v, (list, tuple)):
-        v = [realize(i, *args, **kwargs) for i in v]
+        v = [realize(i, *args, **kwargs) if callable(i) or isinstance(i, (dict, list, tuple)) else i for i in v]
         return v
 
     return v(*args, **kwargs) if callable(v) else v
+
+
+def realize_many(values: dict[str, Any], *args, **kwargs) -> dict[str, Any]:
+    "Evaluate every value of a flat mapping in one pass, returning a new dict."
+
+    return {k: realize(v, *args, **kwargs) for k, v in values.items()}
@@ -10,16 +10,15 @@ for a job (e.g. `after: plugin:python`).
 """
 
 import importlib
+import os
 import re
 import sys
 from pathlib import Path
 from types import ModuleType
-from typing import Any, Callable, Literal
+from typing import Any, Callable, Iterator, Literal
 
 import rich.prompt
 import rich.style
-from rich.syntax import Syntax
-from rich.table import Table
 
 from lib.util import ConfigBox, Style, console, get_program_bin, realize, _exit
 
@@ -64,7 +63,7 @@ class BasePlugin:
         prompt: str = f"[bold]?[/] [bold blue]plugin:{self.key}[/] -> [bold]{msg}[/]"
         return rich.prompt.Prompt.ask(prompt)
 
-    def print(self, msg: str, style: Style = Style.INFO) -> None:
+    def print(self, msg: str, style: str = Style.INFO) -> None:
         "Output prefixed with plugin identifier."
         console.print(f"  {style}{msg}")
 
@@ -86,7 +85,9 @@ def load_plugin(
 ) -> None:
     "Load a plugin, if enabled."
 
-    if not project_config.get(f"plugins.{plugin.key}"):
+    plugin_config: ConfigBox | None = (project_config.get("plugins") or {}).get(plugin.key)
+
+    if not plugin_config:
         return
 
     plugin_name: str = f"plugin:{plugin.key}"
@@ -101,11 +102,10 @@ def load_plugin(
 
     console.print(f"{Style.PLUGIN_LOAD}[cyan]{plugin_name:<{pad}}[/] [dim]{plugin.__doc__}")
 
-    if "tmp" not in project_config.plugins[plugin.key]:
-        project_config.plugins[plugin.key].tmp = project_config.get("tmp", "/tmp")
+    if "tmp" not in plugin_config:
+        plugin_config["tmp"] = project_config.get("tmp", "/tmp")
 
-    for k, v in project_config.plugins[plugin.key].items():
-        project_config.plugins[plugin.key][k] = realize(v, workdir=Path("."))
+    realize(plugin_config, workdir=Path("."))  # in place, touching only lazy values and containers
 
     data = plugin.load(config=project_config, env=process_env)
 
@@ -130,7 +130,7 @@ def unload_plugin(
 ) -> None:
     "Unload plugin, if supported."
 
-    plugin_config: ConfigBox | None = project_config.get(f"plugins.{plugin.key}")
+    plugin_config: ConfigBox | None = (project_config.get("plugins") or {}).get(plugin.key)
     pad: int = 20
 
     if not plugin_config:
@@ -139,8 +139,7 @@ def unload_plugin(
     if "tmp" not in plugin_config:
         plugin_config["tmp"] = project_config.get("tmp", "/tmp")
 
-    for k, v in plugin_config.items():
-        plugin_config[k] = realize(v, workdir=Path("."))
+    realize(plugin_config, workdir=Path("."))  # in place, touching only lazy values and containers
 
     if explain:
         console.print(f"{Style.PLUGIN_INFO}[cyan]unplug:{plugin.key:<{pad}}[/] {plugin.unload.__doc__}")
@@ -164,6 +163,72 @@ def unload_plugin(
     console.print(f"{Style.PLUGIN_UNLOAD}[cyan]{plugin_name:<{pad}}[/] [dim]{plugin.unload.__doc__}")
 
 
+# ==============================================================================
+
+# (plugins dir, its st_mtime_ns) -> plugin modules found there
+_plugin_files: dict[tuple[Path, int], list[os.DirEntry]] = {}
+
+# module name -> st_mtime_ns of the source it was last executed from
+_plugin_mtimes: dict[str, int] = {}
+
+
+def _iter_plugin_modules(plugin_dir: Path) -> Iterator[os.DirEntry]:
+    "Yield the `mod_*.py` files in plugin_dir from a single directory read."
+
+    with os.scandir(plugin_dir) as entries:
+        for entry in entries:
+            if (
+                entry.name.startswith("mod_")
+                and entry.name.endswith(".py")
+                and entry.is_file(follow_symlinks=False)
+            ):
+                yield entry
+
+
+def list_plugin_files(plugin_dir: Path) -> list[os.DirEntry]:
+    "Return the plugin modules in plugin_dir, scanning again only if the directory changed."
+
+    key: tuple[Path, int] = (plugin_dir, plugin_dir.stat().st_mtime_ns)
+
+    if key not in _plugin_files:
+        _plugin_files[key] = list(_iter_plugin_modules(plugin_dir))
+
+    return _plugin_files[key]
+
+
+def import_plugin(module_file: os.DirEntry) -> ModuleType:
+    """
+    Import a plugin module once. Set ADHD_RELOAD_PLUGINS to have plugins whose
+    source changed since they were imported re-executed (handy while writing one).
+    """
+
+    name: str = f"plugins.{module_file.name[:-3]}"
+    module: ModuleType | None = sys.modules.get(name)
+    mtime: int
+
+    # os.stat() rather than DirEntry.stat(), which would hand back the mtime it first saw
+    if module is None:
+        module = importlib.import_module(name)
+        _plugin_mtimes[name] = os.stat(module_file.path).st_mtime_ns
+    elif os.environ.get("ADHD_RELOAD_PLUGINS") and _plugin_mtimes.get(name) != (
+        mtime := os.stat(module_file.path).st_mtime_ns
+    ):
+        module = importlib.reload(module)
+        _plugin_mtimes[name] = mtime
+
+    return module
+
+
+def _discover_plugins() -> dict[str, ModuleType]:
+    """
+    Map each plugin's module stem to its module, from one directory listing.
+    Not cached itself: the listing and the imports already are, and ADHD_RELOAD_PLUGINS
+    has to be able to swap modules out between calls.
+    """
+
+    return {entry.name[:-3]: import_plugin(entry) for entry in list_plugin_files(get_program_bin() / "plugins")}
+
+
 # ==============================================================================
 
 
@@ -177,22 +242,22 @@ def load_plugins(
 ) -> dict[str, BasePlugin]:
     "Locate plugins, import them, and run plugin.load() for each."
 
-    plugin_dir: Path = get_program_bin() / "plugins"
     plugin: BasePlugin
     plugins: dict[str, BasePlugin] = {}
-
-    for mod in plugin_dir.glob("mod_*.py"):
-        module: ModuleType = importlib.import_module(f"plugins.{mod.stem}")
-        importlib.reload(module)
-        plugins[mod.stem] = module.Plugin(
-            verbose=verbose or project_config.get(f"plugins.{module.Plugin.key}.verbose", False),
-            debug=debug or project_config.get(f"plugins.{module.Plugin.key}.debug", False),
+    plugins_config: dict[str, Any] = project_config.get("plugins") or {}  # looked up once, not per plugin
+
+    for stem, module in _discover_plugins().items():
+        options: Any = plugins_config.get(module.Plugin.key)
+        options = options if isinstance(options, dict) else {}  # some plugins are configured with a list
+        plugins[stem] = module.Plugin(
+            verbose=verbose or options.get("verbose", False),
+            debug=debug or options.get("debug", False),
         )
 
     for plugin in plugins.values():
         if not (
             plugin.key
-            and (plugin_config := project_config.get(f"plugins.{plugin.key}"))
+            and (plugin_config := plugins_config.get(plugin.key))
             and (plugin_config.get("autoload", True) or enabled.get(plugin.key, False))
         ):
             continue
@@ -239,31 +304,28 @@ def notify_plugins(
 
 
 def print_plugin_help(pager: str | bool = False, verbose=False) -> None:
-    plugins_dir: Path = get_program_bin() / "plugins"
-    plugins: dict[str, BasePlugin] = {}
-
-    for module_file in plugins_dir.glob("mod_*.py"):
-        module = importlib.import_module(f"plugins.{module_file.stem}")
-        if not module.Plugin.enabled:
-            continue
-        plugins[module_file.stem] = module  # type: ignore
+    plugins: dict[str, BasePlugin] = {
+        stem: module for stem, module in _discover_plugins().items() if module.Plugin.enabled  # type: ignore
+    }
 
     if verbose:
         return print_plugin_help_verbose(plugins, pager=pager)
 
     width: int = max(len(p) for p in plugins) + 22
 
-    console.print()
+    lines: list[str] = [""]  # rendered in one print, surrounded by blank lines
     for key, plugin in sorted(plugins.items()):
         doc: str = (plugin.__doc__ or "No description available.").strip("\n").split("\n")[0]
-        console.print(
-            f" :white_circle:{f'[bold cyan]{key}[/] [dim]':.<{width}}[/] {doc}",
-            highlight=False,
-        )
-    console.print()
+        lines.append(f" :white_circle:{f'[bold cyan]{key}[/] [dim]':.<{width}}[/] {doc}")
+    lines.append("")
+
+    console.print("\n".join(lines), highlight=False)
 
 
 def print_plugin_help_verbose(plugins: dict[str, BasePlugin], pager: str | bool = False) -> None:
+    from rich.syntax import Syntax  # pulls in pygments, so only when asked for
+    from rich.table import Table
+
     table: Table = Table(
         show_header=False,
         padding=2,
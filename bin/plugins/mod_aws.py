@@ -86,6 +86,7 @@ from typing import Any, Callable
 import ruamel.yaml as yaml
 
 from lib.boot import missing_modules
+from lib.loader import load_yaml
 from lib.util import ConfigBox, Style, check_permissions, console, get_resolved_path
 
 from plugins import BasePlugin, MetadataType, public
@@ -97,6 +98,8 @@ if missing := missing_modules(required_modules):
 else:
     import boto3
 
+env_name_regex = re.compile(r"[^a-zA-Z_0-9]")
+
 
 # ==============================================================================
 
@@ -205,7 +208,7 @@ class Plugin(BasePlugin):
 
             try:
                 cached_data.seek(0)
-                data = yaml.load(cached_data, Loader=yaml.SafeLoader)
+                data = load_yaml(cached_data.read().encode())  # retried without libyaml if it balks
             except:
                 prompt = True
             else:
@@ -314,7 +317,7 @@ class Plugin(BasePlugin):
         "Get key/value pairs from SSM Parameter Store and adds them to the environment."
 
         def normalize(name: str) -> str:
-            if name := re.sub(r"[^a-zA-Z_0-9]", "_", name):
+            if name := env_name_regex.sub("_", name):
                 return "_" * name[0].isdigit() + name
             return "_"
 
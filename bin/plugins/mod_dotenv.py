@@ -18,7 +18,6 @@ required_binaries: list[str] = []
 
 import sys
 from pathlib import Path
-from typing import Any
 
 from lib.boot import missing_modules
 from lib.util import ConfigBox, Style, check_permissions, console
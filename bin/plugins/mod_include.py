@@ -17,7 +17,9 @@ required_modules: dict[str, str] = {}
 required_binaries: list[str] = []
 
 
-import ruamel.yaml as yaml
+from pathlib import Path
+
+from lib.loader import load_yaml
 from lib.util import ConfigBox, Style
 from plugins import BasePlugin, MetadataType
 
@@ -35,8 +37,8 @@ class Plugin(BasePlugin):
         conf: ConfigBox = ConfigBox()
 
         for _include in config:
-            with open(_include, "r") as f:
-                conf.update(yaml.load(f.read(), Loader=yaml.SafeLoader))
+            # libyaml first, then the pure Python parser for what it rejects
+            conf.update(load_yaml(Path(_include).read_bytes()))
             if verbose:
                 self.print(f"Included {_include}", Style.SUCCESS)
 
@@ -44,7 +44,6 @@ from functools import partial
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import Any, Generator
-from types import ModuleType
 
 import ruamel.yaml as yaml
 from lib.boot import missing_binaries, missing_modules
@@ -120,7 +120,7 @@ class Plugin(BasePlugin):
                 "PATH": os.pathsep.join([str(bin_dir), env["PATH"]]),
             }
         )
-        style: Style
+        style: str
 
         env.update(venv_env)
         bin_dir.mkdir(parents=True, exist_ok=True)
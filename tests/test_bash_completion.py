@@ -0,0 +1,66 @@
+import io
+
+import pytest
+from bash_completion import PySafeLoader, get_cached_jobs, scan_job_names, scan_with_fallback
+
+
+def scan(text: str, **kwargs) -> list[str] | None:
+    return scan_job_names(io.BytesIO(text.encode()), **kwargs)
+
+
+def test_scan_collects_top_level_job_names():
+    text = """
+env: {A: 1}
+jobs:
+  build: {run: make}
+  test:
+    after: build
+    run: [pytest]
+home: .
+"""
+    assert scan(text) == ["build", "test"]
+
+
+def test_scan_without_jobs():
+    assert scan("home: .\n") == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "common: &c {a: {run: x}}\njobs:\n  <<: *c\n  b: {run: y}\n",  # merge among the jobs
+        "base: &b {jobs: {a: {run: x}}}\n<<: *b\n",  # top-level merge may supply jobs
+        "other: &o {a: {run: x}}\njobs: *o\n",  # jobs is an alias
+        "jobs: !include jobs.yaml\n",  # jobs is a tagged node
+        "jobs: [a, b]\n",  # not a mapping at all
+    ],
+)
+def test_scan_defers_to_a_full_load(text):
+    assert scan(text) is None
+
+
+def test_scan_accepts_colons_in_flow_sequences():
+    # libyaml rejects this, the pure Python parser doesn't
+    text: bytes = b"jobs:\n  web: {open: [ http://localhost:8000/ ]}\n"
+
+    assert scan_job_names(io.BytesIO(text), loader=PySafeLoader) == ["web"]
+    assert scan_with_fallback(io.BytesIO(text)) == ["web"]
+
+
+def test_failed_parse_is_not_cached(tmp_path):
+    project = tmp_path / "broken.yaml"
+    project.write_text("jobs: {a: [\n")
+
+    assert get_cached_jobs(project, project.stat()) == []
+    assert not (tmp_path / ".broken.completions").exists()
+
+
+def test_jobs_are_cached_until_the_project_changes(tmp_path):
+    project = tmp_path / "foo.yaml"
+    project.write_text("jobs: {a: {run: x}}\n")
+
+    assert get_cached_jobs(project, project.stat()) == ["a"]
+    assert (tmp_path / ".foo.completions").exists()
+
+    project.write_text("jobs: {a: {run: x}, bb: {run: y}}\n")
+    assert get_cached_jobs(project, project.stat()) == ["a", "bb"]
@@ -0,0 +1,60 @@
+from lib.jobs import get_job, get_referenced_vars
+from lib.loader import invalidate, load_project
+from lib.util import ConfigBox
+
+PROJECT = """
+env:
+  NAME: world
+  GREETING: !env hello ${NAME}
+  UNUSED: !shell_stdout exit 1
+jobs:
+  greet:
+    help: !env says ${GREETING}
+    run: !env echo ${GREETING}
+    env:
+      LOUD: !env ${GREETING}!
+  shout:
+    help: !shell_stdout echo "$LOUD"
+    run: echo
+    env:
+      LOUD: !env ${GREETING}!
+"""
+
+
+def load(tmp_path) -> ConfigBox:
+    invalidate()
+    project = tmp_path / "p.yaml"
+    project.write_text(PROJECT)
+    return ConfigBox(load_project(project))
+
+
+def test_referenced_vars_are_transitive(tmp_path):
+    config = load(tmp_path)
+    env = {**config.env, **config.jobs.greet.env}
+
+    assert get_referenced_vars([config.jobs.greet.help], env) == ["GREETING", "NAME"]
+    assert get_referenced_vars([config.jobs.greet.run, "plain"], env) == ["GREETING", "NAME"]
+    assert get_referenced_vars(["plain", None], env) == []
+
+
+def test_explain_resolves_what_it_shows(tmp_path):
+    config = load(tmp_path)
+    job = get_job("greet", config.jobs.greet, str(tmp_path), str(tmp_path), config.env, explain=True)
+
+    assert job.help == "says hello world"
+    assert job.run == ["echo hello world"]
+
+
+def test_explain_leaves_unreferenced_variables_alone(tmp_path):
+    config = load(tmp_path)
+    get_job("greet", config.jobs.greet, str(tmp_path), str(tmp_path), config.env, explain=True)
+
+    assert callable(config.env.UNUSED)  # never run
+
+
+def test_explain_never_hands_a_repr_to_a_shell(tmp_path):
+    config = load(tmp_path)
+    # $LOUD is expanded by the shell, not by adhd, so nothing marks it as referenced
+    job = get_job("shout", config.jobs.shout, str(tmp_path), str(tmp_path), config.env, explain=True)
+
+    assert "LazyValue" not in job.help
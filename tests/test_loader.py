@@ -0,0 +1,96 @@
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+from lib import loader
+from lib.loader import LazyValue, invalidate, load_project
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch, tmp_path):
+    "Start every test without in-memory caches, from the directory its files live in."
+
+    invalidate()
+    monkeypatch.chdir(tmp_path)
+    yield
+    invalidate()
+
+
+def write(path: Path, text: str) -> Path:
+    path.write_text(text)
+    return path
+
+
+def sidecar(project: Path) -> Path:
+    return project.with_name(f".{project.stem}.parsed")
+
+
+def test_sidecar_is_written_owner_only(tmp_path):
+    project = write(tmp_path / "p.yaml", "env: {A: 1}\n")
+
+    assert load_project(project) == {"env": {"A": 1}}
+    assert sidecar(project).stat().st_mode & 0o777 == 0o600
+
+
+def test_sidecar_is_reused(tmp_path):
+    project = write(tmp_path / "p.yaml", "env: {A: 1}\n")
+    load_project(project)
+
+    with open(sidecar(project), "rb") as f:
+        key, *rest, document = pickle.load(f)
+    with open(sidecar(project), "wb") as f:  # same key, different document: proves it's what's read
+        pickle.dump((key, *rest, {"env": {"A": "from sidecar"}}), f)
+
+    invalidate()
+    assert load_project(project) == {"env": {"A": "from sidecar"}}
+
+
+def test_sidecar_is_ignored_when_the_loader_changes(tmp_path, monkeypatch):
+    project = write(tmp_path / "p.yaml", "env: {A: 1}\n")
+    load_project(project)
+
+    with open(sidecar(project), "rb") as f:
+        key, *rest, document = pickle.load(f)
+    with open(sidecar(project), "wb") as f:
+        pickle.dump((key, *rest, {"env": {"A": "stale"}}), f)
+
+    invalidate()
+    monkeypatch.setattr(loader, "parsed_cache_version", loader.parsed_cache_version + 1)
+    assert load_project(project) == {"env": {"A": 1}}
+
+
+def test_changed_nested_include_invalidates(tmp_path):
+    inner = write(tmp_path / "inner.yaml", "value: 1\n")
+    write(tmp_path / "outer.yaml", "nested: !include inner.yaml\n")
+    first = write(tmp_path / "first.yaml", "conf: !include outer.yaml\n")
+    second = write(tmp_path / "second.yaml", "conf: !include outer.yaml\n")
+
+    load_project(first)
+    # outer.yaml now comes from the include cache, but second still depends on inner.yaml
+    assert load_project(second) == {"conf": {"nested": {"value": 1}}}
+
+    write(inner, "value: 22\n")
+    assert load_project(second) == {"conf": {"nested": {"value": 22}}}
+
+    invalidate()  # and across runs, through the sidecar
+    write(inner, "value: 333\n")
+    assert load_project(second) == {"conf": {"nested": {"value": 333}}}
+
+
+def test_colons_in_flow_sequences_parse(tmp_path):
+    # libyaml rejects these plain scalars; the pure Python parser is used instead
+    project = write(tmp_path / "p.yaml", "open: [ http://localhost:8000/ ]\n")
+
+    assert load_project(project) == {"open": ["http://localhost:8000/"]}
+
+
+def test_home_paths_stay_lazy(tmp_path, monkeypatch):
+    project = write(tmp_path / "p.yaml", "home: !path [ '~', src ]\ntmp: !path [ /var, tmp ]\n")
+    document = load_project(project)
+
+    assert document["tmp"] == "/var/tmp"  # plain absolute paths are folded
+    assert isinstance(document["home"], LazyValue)
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert document["home"](env={}, workdir=tmp_path) == os.path.realpath(tmp_path / "src")
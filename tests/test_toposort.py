@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from lib.util import CircularDependencyError, toposort_flatten
+
+
+def test_dependencies_come_first():
+    assert toposort_flatten({"job": ["x", "y"], "x": ["y"], "y": []}) == ["y", "x", "job"]
+
+
+def test_levels_are_sorted_and_include_undeclared_names():
+    deps = {"a": {"b", "HOME"}, "b": {"c"}, "c": set(), "d": set()}
+
+    assert toposort_flatten(deps) == ["HOME", "c", "d", "b", "a"]
+
+
+def test_self_references_are_ignored():
+    assert toposort_flatten({"a": {"a"}, "b": {"a", "b"}}) == ["a", "b"]
+
+
+def test_empty():
+    assert toposort_flatten({}) == []
+
+
+def test_cycle_reports_what_is_left():
+    with pytest.raises(CircularDependencyError) as e:
+        toposort_flatten({"a": {"b"}, "b": {"a"}, "c": {"a", "d"}, "d": set()})
+
+    assert e.value.data == {"a": {"b"}, "b": {"a"}, "c": {"a"}}
+    assert str(e.value) == "Circular dependencies exist among these items: {'a':{'b'}, 'b':{'a'}, 'c':{'a'}}"
+
+
+def test_cycle_report_drops_self_references():
+    with pytest.raises(CircularDependencyError) as e:
+        toposort_flatten({"a": {"a", "b"}, "b": {"a", "b"}})
+
+    assert e.value.data == {"a": {"b"}, "b": {"a"}}
+
+
+def reference(deps: dict[str, set[str]]) -> list[str]:
+    "toposort 1.x's flattened order, which this implementation replaces."
+
+    data = {k: set(v) - {k} for k, v in deps.items()}
+    data.update({d: set() for v in data.values() for d in v if d not in data})
+    order: list[str] = []
+
+    while ready := {k for k, v in data.items() if not v}:
+        order.extend(sorted(ready))
+        data = {k: v - ready for k, v in data.items() if k not in ready}
+
+    if data:
+        raise CircularDependencyError(data)
+
+    return order
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_toposort(seed):
+    rng = random.Random(seed)
+    names = [f"n{i}" for i in range(rng.randint(1, 12))]
+    declared = rng.sample(names, rng.randint(1, len(names)))
+    deps = {n: set(rng.sample(names, rng.randint(0, min(3, len(names))))) for n in declared}
+
+    try:
+        expected = reference(deps)
+    except CircularDependencyError as e:
+        with pytest.raises(CircularDependencyError) as raised:
+            toposort_flatten(deps)
+        assert raised.value.data == e.data
+    else:
+        assert toposort_flatten(deps) == expected